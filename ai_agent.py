@@ -1,41 +1,229 @@
 """
 AI Agent for parsing meeting requests and scheduling conflicts resolution
 """
+import asyncio
 import json
+import os
 import re
-from datetime import datetime, timedelta
-from openai import OpenAI
+from datetime import datetime, timedelta, timezone
+import httpx
+from openai import AsyncOpenAI
 from vllm import SamplingParams
+try:
+    import orjson
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing handlers still apply
+    _json_loads = orjson.loads
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
 BASE_URL = f"http://localhost:4000/v1"
 MODEL_PATH = "/home/user/Models/meta-llama/Meta-Llama-3.1-8B-Instruct"
-client = OpenAI(api_key="NULL", base_url=BASE_URL, timeout=None, max_retries=0)
+# Matches vLLM's --max-num-seqs so in-flight requests never exceed what one batch can hold
+MAX_CONCURRENT_REQUESTS = 256
+_IST = timezone(timedelta(hours=5, minutes=30))
+# openai's own pool keeps only 100 idle connections; this keeps one per in-flight request
+# (MAX_CONCURRENT_REQUESTS per agent), so bursts reuse connections to vLLM instead of reconnecting
+HTTP_LIMITS = httpx.Limits(max_connections=512, max_keepalive_connections=256)
+
+def make_http_client():
+    """Sized httpx pool for one AsyncOpenAI client; httpx pools belong to the event loop that first uses them"""
+    return httpx.AsyncClient(limits=HTTP_LIMITS, timeout=httpx.Timeout(600.0, connect=10.0))
+
+# For callers driving their own single event loop, MeetingAssistant builds a client on its loop
+client = AsyncOpenAI(api_key="NULL", base_url=BASE_URL, http_client=make_http_client(), max_retries=0)
+
+# JSON schemas for vLLM guided decoding, the model can only sample tokens that keep the output valid
+PARSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "participants": {"type": "array", "items": {"type": "string"}},
+        "meeting_duration": {"type": "integer"},
+        "time_constraints": {"type": "string"},
+        "subject": {"type": "string"}
+    },
+    "required": ["participants", "meeting_duration", "time_constraints", "subject"]
+}
+RESOLVE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["schedule_all", "schedule_partial", "reschedule_tomorrow", "find_alternative"]},
+        "recommended_time": {"type": "string"},
+        "participants_to_include": {"type": "array", "items": {"type": "string"}},
+        "reason": {"type": "string"}
+    },
+    "required": ["action", "recommended_time", "participants_to_include", "reason"]
+}
+RESOLVE_RULES = """You are an AI scheduling assistant that resolves meeting conflicts intelligently.
+
+Rules for conflict resolution:
+1. If all participants are free at requested time -> schedule at requested time
+2. If one person is busy with low-priority meeting -> schedule with available participants first
+3. If person is busy with high-priority meeting -> find alternative time when all are free
+4. If both are busy -> reschedule to next day at same time
+5. Consider meeting importance based on subjects like 'urgent', 'client', 'critical'
+
+Return JSON with:
+- 'action': 'schedule_all', 'schedule_partial', 'reschedule_tomorrow', 'find_alternative'
+- 'recommended_time': 'YYYY-MM-DDTHH:MM:SS+05:30'
+- 'participants_to_include': list of emails
+- 'reason': explanation of decision
+
+Current date context: July 2025"""
+
+# Fallback parser patterns, compiled once at import instead of per email
+# (pattern, minutes per captured unit); "half hour" has nothing to capture
+_DURATION_RES = [
+    (re.compile(r'(\d+)\s*(?:minutes?|mins?)'), 1),
+    (re.compile(r'half\s*hour'), None),
+    (re.compile(r'(\d+)\s*hours?'), 60)
+]
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+_NAME_RE = re.compile(r'(?:attendees?:?\s*|team[,:]?\s*)([A-Za-z\s,&]+)', re.IGNORECASE)
+_SPLIT_NAMES = re.compile(r'[,&]')
+_DAY_RE = re.compile(r'\b(saturday|sunday|weekend|thursday|monday|tuesday|wednesday|friday|tomorrow)s?\b')
+# Weekend words win over weekdays, weekdays win over "tomorrow"
+_TIME_CONSTRAINT_PRIORITY = ('saturday', 'sunday', 'weekend', 'thursday', 'monday', 'tuesday', 'wednesday', 'friday', 'tomorrow')
+
 class AI_AGENT:
-    def __init__(self, client, MODEL_PATH):
+    def __init__(self, client, MODEL_PATH, max_concurrency=MAX_CONCURRENT_REQUESTS, fast_path=None):
         self.client = client
         self.model_path = MODEL_PATH
+        self.max_concurrency = max_concurrency
+        # AI_AGENT_FAST_PATH=1 answers template-like emails with the rule parser, skipping the LLM
+        if fast_path is None:
+            fast_path = os.environ.get('AI_AGENT_FAST_PATH') == '1'
+        self.fast_path = fast_path
+        self._semaphore = None
+        self._semaphore_loop = None
     
-    def parse_email(self, email_content):
-        """Parse email content to extract meeting details"""
-        response = self.client.chat.completions.create(
-            model=self.model_path,
-            temperature=0.0,
-            max_tokens=150, 
-            messages=[{
-                "role": "user",
-                "content": f"""
+    def _get_semaphore(self):
+        """Concurrency cap for the running event loop (asyncio primitives are loop-bound)"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def _build_parse_prompt(self, email_content):
+        """Prompt shared by the chat, bulk and offline parsing paths"""
+        return f"""
                 Extract meeting details and return as JSON:
                 1. participants (emails)
                 2. meeting_duration (minutes, default: 30)
                 3. time_constraints (day/time)
                 4. subject
-        
+
                 Email: {email_content}
                 """
-            }]
+
+    def _fast_parse(self, email_content):
+        """Rule-based result when it is already complete, None when the LLM is needed"""
+        if not self.fast_path:
+            return None
+        candidate = self._fallback_parse(email_content)
+        if candidate['participants'] and candidate['time_constraints'] != 'next available time':
+            return candidate
+        return None
+
+    async def parse_email(self, email_content):
+        """Parse email content to extract meeting details"""
+        candidate = self._fast_parse(email_content)
+        if candidate is not None:
+            return candidate
+        
+        async with self._get_semaphore():
+            response = await self.client.chat.completions.create(
+                model=self.model_path,
+                temperature=0.0,
+                max_tokens=150,
+                messages=[{
+                    "role": "user",
+                    "content": self._build_parse_prompt(email_content)
+                }],
+                extra_body={"guided_json": PARSE_SCHEMA}
+            )
+
+        return self._process_parsed_content(response.choices[0].message.content, email_content)
+
+    async def parse_emails_bulk(self, emails):
+        """
+        Parse several emails with a single batched completions request
+        Args:
+            emails (list): Raw email contents
+        Returns:
+            list: Parsed meeting details, in the same order as emails
+        """
+        results = [self._fast_parse(email_content) for email_content in emails]
+        pending = [position for position, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        # vLLM's OpenAI-compatible server accepts a list of prompts in one request
+        async with self._get_semaphore():
+            response = await self.client.completions.create(
+                model=self.model_path,
+                prompt=[self._build_parse_prompt(emails[position]) for position in pending],
+                temperature=0.0,
+                max_tokens=150,
+                extra_body={"guided_json": PARSE_SCHEMA}
+            )
+
+        # Choices can come back out of order, index says which prompt they answer
+        texts = [None] * len(pending)
+        for choice in response.choices:
+            texts[choice.index] = choice.text
+
+        for position, text in zip(pending, texts):
+            email_content = emails[position]
+            if text is None:
+                results[position] = self._fallback_parse(email_content)
+            else:
+                results[position] = self._process_parsed_content(text, email_content)
+        return results
+
+    def parse_emails_offline(self, llm, emails):
+        """
+        Parse emails with an in-process vllm.LLM engine in one generate call
+        Args:
+            llm (vllm.LLM): Loaded offline engine
+            emails (list): Raw email contents
+        Returns:
+            list: Parsed meeting details, in the same order as emails
+        """
+        prompts = [self._build_parse_prompt(email_content) for email_content in emails]
+        outputs = llm.generate(prompts, SamplingParams(temperature=0.0, max_tokens=150))
+
+        return [
+            self._process_parsed_content(output.outputs[0].text, email_content)
+            for email_content, output in zip(emails, outputs)
+        ]
+    
+    async def parse_emails_batch(self, emails):
+        """
+        Parse several emails concurrently so vLLM can serve them in one continuous batch
+        Args:
+            emails (list): Raw email contents
+        Returns:
+            list: Parsed meeting details, in the same order as emails
+        """
+        results = await asyncio.gather(
+            *(self.parse_email(email_content) for email_content in emails),
+            return_exceptions=True
         )
         
+        # A failed request only costs that email a fallback parse
+        return [
+            self._fallback_parse(email_content) if isinstance(result, Exception) else result
+            for email_content, result in zip(emails, results)
+        ]
+    
+    def _process_parsed_content(self, content, email_content):
+        """Normalize the model's JSON answer, falling back to manual parsing"""
         try:
-            parsed_data = json.loads(response.choices[0].message.content)
+            parsed_data = _json_loads(content)
             
             # Ensure participants is a list
             if 'participants' in parsed_data:
@@ -57,65 +245,43 @@ class AI_AGENT:
             return parsed_data
             
         except json.JSONDecodeError:
-            # Fallback parsing if AI response is not valid JSON
+            # Only reachable if the server lacks guided decoding or the output hit max_tokens
             return self._fallback_parse(email_content)
     
     def _fallback_parse(self, email_content):
         """Fallback manual parsing if AI fails"""
-        # Extract duration
-        duration_patterns = [
-            r'(\d+)\s*(?:minutes?|mins?)',
-            r'half\s*hour',
-            r'(\d+)\s*hours?'
-        ]
+        email_lower = email_content.lower()
         
+        # Extract duration
         duration = 30  # default
-        for pattern in duration_patterns:
-            match = re.search(pattern, email_content.lower())
+        for pattern, minutes_per_unit in _DURATION_RES:
+            match = pattern.search(email_lower)
             if match:
-                if 'half' in pattern:
+                if minutes_per_unit is None:
                     duration = 30
-                elif 'hour' in pattern:
-                    duration = int(match.group(1)) * 60
                 else:
-                    duration = int(match.group(1))
+                    duration = int(match.group(1)) * minutes_per_unit
                 break
         
         # Extract emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, email_content)
+        emails = _EMAIL_RE.findall(email_content)
         
         # Extract names without emails
-        name_pattern = r'(?:attendees?:?\s*|team[,:]?\s*)([A-Za-z\s,&]+)'
-        name_match = re.search(name_pattern, email_content, re.IGNORECASE)
+        name_match = _NAME_RE.search(email_content)
         if name_match:
-            names = re.split(r'[,&]', name_match.group(1))
+            names = _SPLIT_NAMES.split(name_match.group(1))
             for name in names:
                 name = name.strip()
                 if name and '@' not in name:
                     emails.append(f"{name.lower()}@amd.com")
         
         # Extract time constraints including weekend detection
-        time_constraints = 'next available time'
-        email_lower = email_content.lower()
-        if 'saturday' in email_lower:
-            time_constraints = 'saturday'
-        elif 'sunday' in email_lower:
-            time_constraints = 'sunday'
-        elif 'weekend' in email_lower:
-            time_constraints = 'weekend'
-        elif 'thursday' in email_lower:
-            time_constraints = 'thursday'
-        elif 'monday' in email_lower:
-            time_constraints = 'monday'
-        elif 'tuesday' in email_lower:
-            time_constraints = 'tuesday'
-        elif 'wednesday' in email_lower:
-            time_constraints = 'wednesday'
-        elif 'friday' in email_lower:
-            time_constraints = 'friday'
-        elif 'tomorrow' in email_lower:
-            time_constraints = 'tomorrow'
+        # One scan collects every keyword, priority order picks the winner
+        found_days = set(_DAY_RE.findall(email_lower))
+        time_constraints = next(
+            (day for day in _TIME_CONSTRAINT_PRIORITY if day in found_days),
+            'next available time'
+        )
         
         return {
             'participants': emails,
@@ -125,50 +291,37 @@ class AI_AGENT:
             'start_time': None
         }
     
-    def resolve_conflicts(self, all_participants_events, meeting_request, meeting_duration):
+    async def resolve_conflicts(self, all_participants_events, meeting_request, meeting_duration):
         
-        # Prepare context for AI
-        conflict_context = {
-            'meeting_subject': meeting_request.get('subject', ''),
-            'participants_events': all_participants_events,
-            'meeting_duration': meeting_duration,
-            'requested_time': meeting_request.get('time_constraints', '')
+        # Only what the rules need: when each participant is busy and with what
+        compact_events = {
+            participant: [[event['StartTime'], event['EndTime'], event.get('Summary', '')] for event in events]
+            for participant, events in all_participants_events.items()
         }
         
-        response = self.client.chat.completions.create(
-            model=self.model_path,
-            temperature=0.0,
-            messages=[{
-                "role": "user",
-                "content": f"""
-                You are an AI scheduling assistant that resolves meeting conflicts intelligently.
-                
-                Meeting Request: {meeting_request.get('subject', 'Meeting')}
-                Duration: {meeting_duration} minutes
-                Time Constraint: {meeting_request.get('time_constraints', 'flexible')}
-                
-                Participant Events: {json.dumps(all_participants_events, indent=2)}
-                
-                Rules for conflict resolution:
-                1. If all participants are free at requested time -> schedule at requested time
-                2. If one person is busy with low-priority meeting -> schedule with available participants first
-                3. If person is busy with high-priority meeting -> find alternative time when all are free
-                4. If both are busy -> reschedule to next day at same time
-                5. Consider meeting importance based on subjects like 'urgent', 'client', 'critical'
-                
-                Return JSON with:
-                - 'action': 'schedule_all', 'schedule_partial', 'reschedule_tomorrow', 'find_alternative'
-                - 'recommended_time': 'YYYY-MM-DDTHH:MM:SS+05:30'
-                - 'participants_to_include': list of emails
-                - 'reason': explanation of decision
-                
-                Current date context: July 2025
-                """
-            }]
-        )
+        async with self._get_semaphore():
+            response = await self.client.chat.completions.create(
+                model=self.model_path,
+                temperature=0.0,
+                max_tokens=120,
+                messages=[
+                    # Identical on every call, so vLLM prefix caching reuses its KV blocks
+                    {"role": "system", "content": RESOLVE_RULES},
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Meeting Request: {meeting_request.get('subject', 'Meeting')}\n"
+                            f"Duration: {meeting_duration} minutes\n"
+                            f"Time Constraint: {meeting_request.get('time_constraints', 'flexible')}\n"
+                            f"Participant Events [start, end, summary]: {_json_dumps(compact_events)}"
+                        )
+                    }
+                ],
+                extra_body={"guided_json": RESOLVE_SCHEMA}
+            )
         
         try:
-            return json.loads(response.choices[0].message.content)
+            return _json_loads(response.choices[0].message.content)
         except:
             # Fallback decision making
             return self._fallback_conflict_resolution(all_participants_events, meeting_request, meeting_duration)
@@ -216,10 +369,10 @@ class AI_AGENT:
         now = datetime.now()
         # Round up to next hour
         next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        return next_hour.strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        return next_hour.replace(tzinfo=_IST).isoformat(timespec='seconds')
     
     def _get_tomorrow_slot(self, duration_mins):
         """Get tomorrow's time slot"""
         tomorrow = datetime.now() + timedelta(days=1)
         morning_slot = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
-        return morning_slot.strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        return morning_slot.replace(tzinfo=_IST).isoformat(timespec='seconds')
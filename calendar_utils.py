@@ -2,10 +2,74 @@
 Calendar Event Extraction Module
 """
 import json
-from datetime import datetime, timezone, timedelta
+import re
+import sys
+import threading
+import time as _time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from datetime import datetime, time, timezone, timedelta
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, the kernels below run as plain Python without it
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+try:
+    from cachetools import TTLCache
+except ImportError:
+    # cachetools is optional, a minimal stand-in with the same get/set behaviour
+    class TTLCache(dict):
+        def __init__(self, maxsize, ttl):
+            super().__init__()
+            self.maxsize = maxsize
+            self.ttl = ttl
+
+        def get(self, key, default=None):
+            entry = super().get(key)
+            if entry is None or entry[0] < _time.monotonic():
+                return default
+            return entry[1]
+
+        def __setitem__(self, key, value):
+            if len(self) >= self.maxsize:
+                now = _time.monotonic()
+                for stale in [k for k, (expires, _) in self.items() if expires < now]:
+                    del self[stale]
+                if len(self) >= self.maxsize:
+                    del self[next(iter(self))]
+            super().__setitem__(key, (_time.monotonic() + self.ttl, value))
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
+# Python 3.11+ parses a trailing 'Z' natively, older versions need it spelled as an offset
+if sys.version_info >= (3, 11):
+    _parse_iso = datetime.fromisoformat
+else:
+    def _parse_iso(timestamp):
+        # 'Z' can only be the last character, no need to search the whole string
+        if timestamp.endswith('Z'):
+            timestamp = timestamp[:-1] + '+00:00'
+        return datetime.fromisoformat(timestamp)
+
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+_FETCH_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix='calendar')
+
+# Bursts of requests for the same day reuse one fetch per participant for 45 seconds
+_CAL_CACHE = TTLCache(maxsize=2048, ttl=45)
+_CAL_CACHE_LOCK = threading.Lock()
+
+# Whole words only, so "sat"/"sun" no longer fire inside words like "saturation" or "Sunil"
+_WEEKEND_RE = re.compile(r'\b(?:sat(?:urday)?|sun(?:day)?|weekend)s?\b', re.IGNORECASE)
+_DAY_RE = re.compile(r'\b(monday|tuesday|wednesday|thursday|friday|tomorrow)s?\b')
+_WEEKDAY_NUM = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4}
+# Same precedence the constraint parser has always used when several days are mentioned
+_WEEKDAY_PRIORITY = ('thursday', 'monday', 'tuesday', 'wednesday', 'friday')
+
 def is_weekend(date_obj):
     """
     Check if a given date falls on weekend (Saturday=5, Sunday=6)
@@ -28,9 +92,69 @@ def check_weekend_constraint(time_constraint):
     Returns:
         bool: True if weekend is requested
     """
-    constraint_lower = time_constraint.lower()
-    weekend_keywords = ['saturday', 'sunday', 'weekend', 'sat', 'sun']
-    return any(keyword in constraint_lower for keyword in weekend_keywords)
+    return bool(_WEEKEND_RE.search(time_constraint))
+
+def _get_service(user):
+    """
+    Get the cached Calendar service for a user on the calling thread
+    
+    Args:
+        user (str): User email address
+    
+    Returns:
+        Resource: Google Calendar v3 service
+    """
+    # httplib2 connections are not thread-safe, so each worker thread gets its own service
+    return _build_service(user, threading.get_ident())
+
+@lru_cache(maxsize=512)
+def _build_service(user, thread_id):
+    """Load the user's token and build the Calendar service once per (user, thread)"""
+    # Load user credentials
+    token_path = f"Keys/{user.split('@')[0]}.token"
+    user_creds = Credentials.from_authorized_user_file(token_path)
+    
+    # Static discovery document, no shared file cache to contend on across threads
+    return build("calendar", "v3", credentials=user_creds, cache_discovery=False, static_discovery=True)
+
+def _fetch_events(user, start, end):
+    """Fetch and convert a user's events, raising on any API or credential error"""
+    events_list = []
+    
+    # Fetch events
+    events_result = _get_service(user).events().list(
+        calendarId='primary',
+        timeMin=start,
+        timeMax=end,
+        singleEvents=True,
+        orderBy='startTime'
+    ).execute()
+    
+    events = events_result.get('items', [])
+    
+    for event in events:
+        # Extract attendees, de-duplicated as they are collected
+        attendees = set()
+        for attendee in event.get("attendees") or []:
+            email = attendee.get("email")
+            if email:
+                attendees.add(email)
+        if not attendees:
+            attendees = {"SELF"}
+        
+        # Extract event times
+        start_time = event["start"].get("dateTime", event["start"].get("date"))
+        end_time = event["end"].get("dateTime", event["end"].get("date"))
+        
+        events_list.append({
+            "StartTime": start_time,
+            "EndTime": end_time,
+            "NumAttendees": len(attendees),
+            "Attendees": list(attendees),
+            "Summary": event.get("summary", "No Title")
+        })
+    
+    return events_list
 
 def retrive_calendar_events(user, start, end):
     """
@@ -44,55 +168,121 @@ def retrive_calendar_events(user, start, end):
     Returns:
         list: List of calendar events
     """
-    events_list = []
-    
     try:
-        # Load user credentials
-        token_path = f"Keys/{user.split('@')[0]}.token"
-        user_creds = Credentials.from_authorized_user_file(token_path)
-        
-        # Build calendar service
-        calendar_service = build("calendar", "v3", credentials=user_creds)
-        
-        # Fetch events
-        events_result = calendar_service.events().list(
-            calendarId='primary',
-            timeMin=start,
-            timeMax=end,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
-        
-        for event in events:
-            attendee_list = []
-            
-            try:
-                # Extract attendees
-                for attendee in event.get("attendees", []):
-                    attendee_list.append(attendee['email'])
-            except:
-                attendee_list.append("SELF")
-            
-            # Extract event times
-            start_time = event["start"].get("dateTime", event["start"].get("date"))
-            end_time = event["end"].get("dateTime", event["end"].get("date"))
-            
-            events_list.append({
-                "StartTime": start_time,
-                "EndTime": end_time,
-                "NumAttendees": len(set(attendee_list)),
-                "Attendees": list(set(attendee_list)),
-                "Summary": event.get("summary", "No Title")
-            })
-            
+        return _fetch_events(user, start, end)
     except Exception as e:
         print(f"Error retrieving calendar events for {user}: {str(e)}")
         # Return empty list if error (user might not have token file)
         return []
+
+def _cached_fetch(user, start, end):
+    """retrive_calendar_events through the short-lived (user, start, end) cache"""
+    key = (user, start, end)
+    with _CAL_CACHE_LOCK:
+        events = _CAL_CACHE.get(key)
+    if events is None:
+        try:
+            events = _fetch_events(user, start, end)
+        except Exception as e:
+            # Failures are not cached, the next request retries instead of seeing a free calendar
+            print(f"Error retrieving calendar events for {user}: {str(e)}")
+            return []
+        with _CAL_CACHE_LOCK:
+            _CAL_CACHE[key] = events
+    return events
+
+def retrieve_calendar_events_multi(users, start, end, timeout=None):
+    """
+    Retrieve calendar events for several users concurrently
     
-    return events_list
+    Args:
+        users (list): User email addresses
+        start (str): Start time in ISO format
+        end (str): End time in ISO format
+        timeout (float): Seconds to wait for all users together, None waits for all
+    
+    Returns:
+        dict: User email -> list of calendar events (empty if not fetched in time)
+    """
+    # Every user has their own credentials, so one HTTPS round-trip per user, overlapped
+    futures = {user: _FETCH_POOL.submit(_cached_fetch, user, start, end) for user in users}
+    done, _ = wait(futures.values(), timeout=timeout)
+    
+    events = {}
+    for user, future in futures.items():
+        if future in done:
+            events[user] = future.result()
+        else:
+            # Too slow, assume available like any other unreachable calendar
+            print(f"Calendar fetch for {user} timed out")
+            future.cancel()
+            events[user] = []
+    return events
+
+def _query_busy(owner, users, start, end):
+    """Run one FreeBusy query for users with owner's credentials"""
+    result = _get_service(owner).freebusy().query(body={
+        "timeMin": start,
+        "timeMax": end,
+        "items": [{"id": user} for user in users]
+    }).execute()
+    return result.get('calendars', {})
+
+def _busy_intervals(calendar):
+    """Shape FreeBusy intervals like calendar events (times only)"""
+    return [{"StartTime": busy["start"], "EndTime": busy["end"]} for busy in calendar.get('busy', [])]
+
+def _retrieve_own_busy(user, start, end):
+    """FreeBusy for a single user with their own token"""
+    try:
+        calendar = _query_busy(user, [user], start, end).get(user, {})
+        if calendar.get('errors'):
+            print(f"Error retrieving busy times for {user}: {calendar['errors']}")
+            return []
+        return _busy_intervals(calendar)
+    except Exception as e:
+        print(f"Error retrieving busy times for {user}: {str(e)}")
+        return []
+
+def retrieve_busy(users, start, end):
+    """
+    Retrieve busy intervals for several users with a single FreeBusy query
+    
+    Only start/end times come back (no summaries or attendees), use
+    retrive_calendar_events when those are needed.
+    
+    Args:
+        users (list): User email addresses
+        start (str): Start time in ISO format
+        end (str): End time in ISO format
+    
+    Returns:
+        dict: User email -> list of {"StartTime", "EndTime"} intervals
+    """
+    if not users:
+        return {}
+    
+    try:
+        calendars = _query_busy(users[0], users, start, end)
+    except Exception as e:
+        print(f"Error retrieving busy times with {users[0]}'s credentials: {str(e)}")
+        calendars = {}
+    
+    busy = {}
+    not_visible = []
+    for user in users:
+        calendar = calendars.get(user)
+        if calendar is None or calendar.get('errors'):
+            not_visible.append(user)
+        else:
+            busy[user] = _busy_intervals(calendar)
+    
+    # Calendars not shared with the first user are asked for with their owner's token
+    futures = {user: _FETCH_POOL.submit(_retrieve_own_busy, user, start, end) for user in not_visible}
+    for user, future in futures.items():
+        busy[user] = future.result()
+    
+    return busy
 
 def get_date_range_from_constraint(time_constraint, duration_mins=30):
     """
@@ -105,20 +295,25 @@ def get_date_range_from_constraint(time_constraint, duration_mins=30):
     Returns:
         tuple: (start_time, end_time) in ISO format or (None, None) if weekend
     """
-    now = datetime.now()
+    # The range only depends on the calendar day, so results are reused until midnight
+    return _compute_range(time_constraint.lower(), datetime.now().date(), duration_mins)
+
+@lru_cache(maxsize=256)
+def _compute_range(constraint_lower, today, duration_mins):
+    """Date range for an already lowercased constraint, as seen on the given day"""
+    now = datetime.combine(today, time())
     
     # Default to looking at next 7 days
-    start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_time = now
     end_time = start_time + timedelta(days=7)
     
-    # Parse common time constraints
-    constraint_lower = time_constraint.lower()
-    
     # Check for explicit weekend requests first
-    if check_weekend_constraint(time_constraint):
+    if check_weekend_constraint(constraint_lower):
         return None, None
     
-    if 'tomorrow' in constraint_lower:
+    found_days = set(_DAY_RE.findall(constraint_lower))
+    
+    if 'tomorrow' in found_days:
         tomorrow = now + timedelta(days=1)
         # Check if tomorrow is weekend
         if is_weekend(tomorrow):
@@ -131,58 +326,18 @@ def get_date_range_from_constraint(time_constraint, duration_mins=30):
         start_time = next_week.replace(hour=0, minute=0, second=0, microsecond=0)
         end_time = start_time + timedelta(days=7)
     
-    elif 'saturday' in constraint_lower or 'sunday' in constraint_lower:
-        # Explicit weekend request
-        return None, None
-    
-    elif 'thursday' in constraint_lower:
-        # Find next Thursday
-        days_ahead = 3 - now.weekday()  # Thursday is 3
-        if days_ahead <= 0:
-            days_ahead += 7
-        thursday = now + timedelta(days=days_ahead)
-        start_time = thursday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = thursday.replace(hour=23, minute=59, second=59, microsecond=0)
-    
-    elif 'monday' in constraint_lower:
-        # Find next Monday
-        days_ahead = 0 - now.weekday()  # Monday is 0
-        if days_ahead <= 0:
-            days_ahead += 7
-        monday = now + timedelta(days=days_ahead)
-        start_time = monday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = monday.replace(hour=23, minute=59, second=59, microsecond=0)
-    
-    elif 'tuesday' in constraint_lower:
-        # Find next Tuesday
-        days_ahead = 1 - now.weekday()  # Tuesday is 1
-        if days_ahead <= 0:
-            days_ahead += 7
-        tuesday = now + timedelta(days=days_ahead)
-        start_time = tuesday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = tuesday.replace(hour=23, minute=59, second=59, microsecond=0)
-    
-    elif 'wednesday' in constraint_lower:
-        # Find next Wednesday
-        days_ahead = 2 - now.weekday()  # Wednesday is 2
-        if days_ahead <= 0:
-            days_ahead += 7
-        wednesday = now + timedelta(days=days_ahead)
-        start_time = wednesday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = wednesday.replace(hour=23, minute=59, second=59, microsecond=0)
-    
-    elif 'friday' in constraint_lower:
-        # Find next Friday
-        days_ahead = 4 - now.weekday()  # Friday is 4
-        if days_ahead <= 0:
-            days_ahead += 7
-        friday = now + timedelta(days=days_ahead)
-        start_time = friday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_time = friday.replace(hour=23, minute=59, second=59, microsecond=0)
+    else:
+        weekday = next((day for day in _WEEKDAY_PRIORITY if day in found_days), None)
+        if weekday:
+            # Next occurrence of that weekday, a week out if it is today
+            days_ahead = (_WEEKDAY_NUM[weekday] - now.weekday()) % 7 or 7
+            target_day = now + timedelta(days=days_ahead)
+            start_time = target_day.replace(hour=0, minute=0, second=0, microsecond=0)
+            end_time = target_day.replace(hour=23, minute=59, second=59, microsecond=0)
     
     # Convert to ISO format with timezone
-    start_iso = start_time.strftime('%Y-%m-%dT%H:%M:%S+05:30')
-    end_iso = end_time.strftime('%Y-%m-%dT%H:%M:%S+05:30')
+    start_iso = start_time.replace(tzinfo=_IST).isoformat(timespec='seconds')
+    end_iso = end_time.replace(tzinfo=_IST).isoformat(timespec='seconds')
     
     return start_iso, end_iso
 
@@ -201,10 +356,10 @@ def check_time_conflict(event_start, event_end, proposed_start, proposed_end):
     """
     try:
         # Parse datetime strings
-        evt_start = datetime.fromisoformat(event_start.replace('Z', '+00:00'))
-        evt_end = datetime.fromisoformat(event_end.replace('Z', '+00:00'))
-        prop_start = datetime.fromisoformat(proposed_start.replace('Z', '+00:00'))
-        prop_end = datetime.fromisoformat(proposed_end.replace('Z', '+00:00'))
+        evt_start = _parse_iso(event_start)
+        evt_end = _parse_iso(event_end)
+        prop_start = _parse_iso(proposed_start)
+        prop_end = _parse_iso(proposed_end)
         
         # Check for overlap
         return not (evt_end <= prop_start or evt_start >= prop_end)
@@ -213,6 +368,44 @@ def check_time_conflict(event_start, event_end, proposed_start, proposed_end):
         # If parsing fails, assume no conflict
         return False
 
+@njit(cache=True)
+def _scan_gaps(starts, ends, work_start, work_end, duration_s):
+    """
+    Find where free slots open in a start-sorted list of events
+    
+    Args:
+        starts (np.ndarray): Event start times, epoch seconds (int64, sorted)
+        ends (np.ndarray): Event end times, epoch seconds (int64)
+        work_start (int): Start of working hours, epoch seconds
+        work_end (int): End of working hours, epoch seconds
+        duration_s (int): Required duration in seconds
+    
+    Returns:
+        np.ndarray: Slot anchors in order, -1 for the start of working hours,
+        otherwise the index of the event whose end opens the slot
+    """
+    n = starts.shape[0]
+    anchors = np.empty(n + 1, dtype=np.int64)
+    count = 0
+    
+    # Slot before first event
+    if n == 0 or starts[0] > work_start + duration_s:
+        anchors[count] = -1
+        count += 1
+    
+    # Slots between events
+    for i in range(n - 1):
+        if starts[i + 1] - ends[i] >= duration_s:
+            anchors[count] = i
+            count += 1
+    
+    # Slot after last event
+    if n > 0 and ends[n - 1] + duration_s <= work_end:
+        anchors[count] = n - 1
+        count += 1
+    
+    return anchors[:count]
+
 def find_free_slots(events, duration_mins, start_time, end_time):
     """
     Find free time slots in a day
@@ -229,44 +422,32 @@ def find_free_slots(events, duration_mins, start_time, end_time):
     free_slots = []
     
     try:
-        day_start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        day_end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+        day_start = _parse_iso(start_time)
+        day_end = _parse_iso(end_time)
         
         # Working hours: 9 AM to 6 PM
         work_start = day_start.replace(hour=9, minute=0)
         work_end = day_start.replace(hour=18, minute=0)
         
-        # Sort events by start time
-        sorted_events = sorted(events, key=lambda x: x['StartTime'])
+        # Parse every event once, then sort the (start, end) pairs
+        parsed_events = sorted(
+            (_parse_iso(event['StartTime']),
+             _parse_iso(event['EndTime']))
+            for event in events
+        )
+        duration = timedelta(minutes=duration_mins)
+        
+        # Scan on epoch seconds, then format the slots from the original datetimes
+        starts = np.array([int(evt_start.timestamp()) for evt_start, _ in parsed_events], dtype=np.int64)
+        ends = np.array([int(evt_end.timestamp()) for _, evt_end in parsed_events], dtype=np.int64)
+        anchors = _scan_gaps(starts, ends, int(work_start.timestamp()), int(work_end.timestamp()), duration_mins * 60)
         
-        # Check slot before first event
-        if not sorted_events or datetime.fromisoformat(sorted_events[0]['StartTime'].replace('Z', '+00:00')) > work_start + timedelta(minutes=duration_mins):
+        for anchor in anchors:
+            slot_start = work_start if anchor < 0 else parsed_events[anchor][1]
             free_slots.append({
-                'start': work_start.isoformat(),
-                'end': (work_start + timedelta(minutes=duration_mins)).isoformat()
+                'start': slot_start.isoformat(),
+                'end': (slot_start + duration).isoformat()
             })
-        
-        # Check slots between events
-        for i in range(len(sorted_events) - 1):
-            event_end = datetime.fromisoformat(sorted_events[i]['EndTime'].replace('Z', '+00:00'))
-            next_event_start = datetime.fromisoformat(sorted_events[i + 1]['StartTime'].replace('Z', '+00:00'))
-            
-            gap_duration = (next_event_start - event_end).total_seconds() / 60
-            
-            if gap_duration >= duration_mins:
-                free_slots.append({
-                    'start': event_end.isoformat(),
-                    'end': (event_end + timedelta(minutes=duration_mins)).isoformat()
-                })
-        
-        # Check slot after last event
-        if sorted_events:
-            last_event_end = datetime.fromisoformat(sorted_events[-1]['EndTime'].replace('Z', '+00:00'))
-            if last_event_end + timedelta(minutes=duration_mins) <= work_end:
-                free_slots.append({
-                    'start': last_event_end.isoformat(),
-                    'end': (last_event_end + timedelta(minutes=duration_mins)).isoformat()
-                })
     
     except Exception as e:
         print(f"Error finding free slots: {str(e)}")
@@ -2,125 +2,175 @@
 Conflict Resolution Engine for Meeting Scheduling
 """
 import json
+import re
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from calendar_utils import find_free_slots, check_time_conflict, is_weekend
+from calendar_utils import find_free_slots, check_time_conflict
+
+# Subject keywords by meeting importance, anything unmatched counts as medium
+IMPORTANCE_KEYWORDS = {
+    'high': frozenset(['client', 'customer', 'urgent', 'critical', 'ceo', 'board', 'emergency']),
+    'medium': frozenset(['team', 'project', 'review', 'planning', 'discussion']),
+    'low': frozenset(['lunch', 'coffee', 'break', 'personal', 'training'])
+}
+
+# One alternation per level, checked high first then low; medium is the default
+# so it needs no pattern. Plain substrings on purpose: 'clients' is still high.
+_IMPORTANCE_PATTERNS = [
+    (level, re.compile('|'.join(sorted(re.escape(keyword) for keyword in IMPORTANCE_KEYWORDS[level]))))
+    for level in ('high', 'low')
+]
+
+def _classify_importance(summary):
+    """Importance level of a meeting from its summary"""
+    summary_lower = summary.lower()
+    for level, pattern in _IMPORTANCE_PATTERNS:
+        if pattern.search(summary_lower):
+            return level
+    return 'medium'
+
+# Weekday constraints in the order they are checked: (day, weekday, default time,
+# optional (time mentioned in the constraint, time to use instead))
+_DAY_MEETING_TIMES = (
+    ('thursday', 3, (10, 30), None),
+    ('monday', 0, (10, 0), ('9:00', (9, 0))),
+    ('tuesday', 1, (10, 0), ('11:00', (11, 0))),
+    ('wednesday', 2, (10, 0), None),
+    ('friday', 4, (10, 0), None),
+)
+
+def _fmt_ist(year, month, day, hour, minute):
+    """ISO 8601 timestamp in IST, on the minute"""
+    return f'{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:00+05:30'
+
+@dataclass(slots=True)
+class Resolution:
+    """Resolution decision, read by output_formatter"""
+    action: str
+    recommended_time: str
+    participants_to_include: list
+    reason: str
+    meeting_duration: int
+    # Action specific details: follow_up_needed, follow_up_meetings or reschedule_needed
+    extra: dict = field(default_factory=dict)
+    
+    def to_dict(self):
+        """Flat dict form, extra details alongside the common fields"""
+        return {
+            'action': self.action,
+            'recommended_time': self.recommended_time,
+            'participants_to_include': self.participants_to_include,
+            'reason': self.reason,
+            'meeting_duration': self.meeting_duration,
+            **self.extra
+        }
+
+# Subjects that need every participant present; whole words so 'call' or 'overall' don't count
+_CRITICAL_RE = re.compile(r'\b(?:all|team|everyone|together)s?\b')
+
+def classify_subject(subject):
+    """Subject fields the resolver branches on, stored on the parsed request by the parser"""
+    subject_lower = subject.lower()
+    return {
+        'requires_all': bool(_CRITICAL_RE.search(subject_lower)),
+        'is_feedback': 'feedback' in subject_lower
+    }
+
+def _subject_flags(parsed_request):
+    """classify_subject fields of a parsed request, worked out here if the parser didn't"""
+    if 'requires_all' in parsed_request:
+        return parsed_request
+    return classify_subject(parsed_request.get('subject', ''))
 
 class ConflictResolver:
     def __init__(self, ai_agent):
         self.ai_agent = ai_agent
     
-    def resolve_scheduling_conflicts(self, parsed_request, all_participants_events, meeting_duration):
+    def resolve_scheduling_conflicts(self, parsed_request, all_participants_events, meeting_duration, now=None):
         """
         Main conflict resolution logic
         Args:
             parsed_request (dict): Parsed meeting request
             all_participants_events (dict): Events for all participants
             meeting_duration (int): Meeting duration in minutes
+            now (datetime): Reference time for every date computed, the current time if not given
         Returns:
-            dict: Resolution decision with timing and participants
+            Resolution: Resolution decision with timing and participants
         """
-        # Analyze conflict situation
-        conflict_analysis = self._analyze_conflicts(all_participants_events, meeting_duration)
+        # One clock reading, so every time in the decision is relative to the same moment
+        if now is None:
+            now = datetime.now()
+        
+        # Who is busy decides the branch; meeting importance is only needed for partial conflicts
+        conflict_state, busy_participants = self._quick_conflict_state(all_participants_events)
         
         # Apply resolution rules based on test cases
-        if conflict_analysis['all_free']:
-            return self._schedule_all_participants(parsed_request, meeting_duration)
+        if conflict_state == 'all_free':
+            return self._schedule_all_participants(parsed_request, meeting_duration, now)
         
-        elif conflict_analysis['some_busy']:
+        elif conflict_state == 'some_busy':
+            available_participants = [
+                participant for participant, events in all_participants_events.items() if not events
+            ]
             return self._handle_partial_conflicts(
                 parsed_request, 
                 all_participants_events, 
-                conflict_analysis,
-                meeting_duration
+                available_participants,
+                busy_participants,
+                meeting_duration,
+                now
             )
         
         else:  # All busy
-            return self._handle_all_busy(parsed_request, meeting_duration)
+            return self._handle_all_busy(parsed_request, meeting_duration, now)
     
-    def _analyze_conflicts(self, all_participants_events, meeting_duration):
-        """Analyze who's busy and who's free"""
-        available_participants = []
-        busy_participants = []
-        conflict_details = {}
-        
-        for participant, events in all_participants_events.items():
-            if not events or len(events) == 0:
-                available_participants.append(participant)
-            else:
-                busy_participants.append(participant)
-                # Analyze importance of conflicting meetings
-                conflict_details[participant] = self._analyze_meeting_importance(events)
+    def _quick_conflict_state(self, all_participants_events):
+        """Classify as 'all_free', 'some_busy' or 'all_busy', along with the busy participants"""
+        busy_participants = [participant for participant, events in all_participants_events.items() if events]
         
-        return {
-            'all_free': len(busy_participants) == 0,
-            'some_busy': 0 < len(busy_participants) < len(all_participants_events),
-            'all_busy': len(busy_participants) == len(all_participants_events),
-            'available_participants': available_participants,
-            'busy_participants': busy_participants,
-            'conflict_details': conflict_details
-        }
+        if not busy_participants:
+            return 'all_free', busy_participants
+        if len(busy_participants) < len(all_participants_events):
+            return 'some_busy', busy_participants
+        return 'all_busy', busy_participants
     
     def _analyze_meeting_importance(self, events):
         """Analyze importance of conflicting meetings based on subject"""
-        importance_keywords = {
-            'high': ['client', 'customer', 'urgent', 'critical', 'ceo', 'board', 'emergency'],
-            'medium': ['team', 'project', 'review', 'planning', 'discussion'],
-            'low': ['lunch', 'coffee', 'break', 'personal', 'training']
-        }
-        
-        meeting_importance = []
-        
-        for event in events:
-            summary = event.get('Summary', '').lower()
-            importance = 'medium'  # default
-            
-            for level, keywords in importance_keywords.items():
-                for keyword in keywords:
-                    if keyword in summary:
-                        importance = level
-                        break
-                if importance != 'medium':
-                    break
-            
-            meeting_importance.append({
+        return [
+            {
                 'event': event,
-                'importance': importance,
+                'importance': _classify_importance(event.get('Summary', '')),
                 'summary': event.get('Summary', '')
-            })
-        
-        return meeting_importance
+            }
+            for event in events
+        ]
     
-    def _schedule_all_participants(self, parsed_request, meeting_duration):
+    def _schedule_all_participants(self, parsed_request, meeting_duration, now):
         """Test Case 1: All participants are available"""
         # Find optimal time based on constraint
-        optimal_time = self._find_optimal_time(parsed_request, meeting_duration)
+        optimal_time = self._find_optimal_time(parsed_request, meeting_duration, now)
         
-        return {
-            'action': 'schedule_all',
-            'recommended_time': optimal_time,
-            'participants_to_include': parsed_request['participants'],
-            'reason': 'All participants are available at the requested time',
-            'meeting_duration': meeting_duration
-        }
+        return Resolution(
+            action='schedule_all',
+            recommended_time=optimal_time,
+            participants_to_include=parsed_request['participants'],
+            reason='All participants are available at the requested time',
+            meeting_duration=meeting_duration
+        )
     
-    def _handle_partial_conflicts(self, parsed_request, all_participants_events, conflict_analysis, meeting_duration):
+    def _handle_partial_conflicts(self, parsed_request, all_participants_events, available_participants, busy_participants, meeting_duration, now):
         """Handle cases where some participants are busy"""
         
-        # Check if the meeting can proceed with fewer people
-        subject = parsed_request.get('subject', '').lower()
-        
-        # Determine if the busy person is critical for this meeting
-        critical_keywords = ['all', 'team', 'everyone', 'together']
-        requires_all = any(keyword in subject for keyword in critical_keywords)
-        
-        if requires_all:
+        # Check if the meeting can proceed with fewer people,
+        # i.e. whether the busy person is critical for this meeting
+        if _subject_flags(parsed_request)['requires_all']:
             # Test Case 3 scenario - need everyone
-            return self._reschedule_for_all(parsed_request, meeting_duration)
+            return self._reschedule_for_all(parsed_request, meeting_duration, now)
         
         else:
             # Test Cases 2 & 4 - can proceed with available participants
-            busy_person = conflict_analysis['busy_participants'][0]
-            busy_events = conflict_analysis['conflict_details'][busy_person]
+            busy_person = busy_participants[0]
+            busy_events = self._analyze_meeting_importance(all_participants_events[busy_person])
             
             # Check if busy person has low-priority conflict
             has_low_priority_conflict = any(
@@ -129,202 +179,140 @@ class ConflictResolver:
             
             if has_low_priority_conflict:
                 # Reschedule the low-priority meeting
-                return self._schedule_with_reschedule(parsed_request, busy_person, meeting_duration)
+                return self._schedule_with_reschedule(parsed_request, busy_person, meeting_duration, now)
             else:
                 # Schedule with available participants only
                 return self._schedule_partial_meeting(
                     parsed_request, 
-                    conflict_analysis['available_participants'],
-                    conflict_analysis['busy_participants'],
-                    meeting_duration
+                    available_participants,
+                    busy_participants,
+                    meeting_duration,
+                    now
                 )
     
-    def _handle_all_busy(self, parsed_request, meeting_duration):
+    def _handle_all_busy(self, parsed_request, meeting_duration, now):
         """Test Case 3: All participants are busy"""
         # Reschedule to tomorrow at the same time
-        tomorrow_time = self._get_tomorrow_time(meeting_duration)
+        tomorrow_time = self._get_tomorrow_time(meeting_duration, now)
         
-        return {
-            'action': 'reschedule_tomorrow',
-            'recommended_time': tomorrow_time,
-            'participants_to_include': parsed_request['participants'],
-            'reason': 'All participants are busy with important meetings. Rescheduling to tomorrow.',
-            'meeting_duration': meeting_duration
-        }
+        return Resolution(
+            action='reschedule_tomorrow',
+            recommended_time=tomorrow_time,
+            participants_to_include=parsed_request['participants'],
+            reason='All participants are busy with important meetings. Rescheduling to tomorrow.',
+            meeting_duration=meeting_duration
+        )
     
-    def _schedule_partial_meeting(self, parsed_request, available_participants, busy_participants, meeting_duration):
+    def _schedule_partial_meeting(self, parsed_request, available_participants, busy_participants, meeting_duration, now):
         """Schedule meeting with only available participants"""
-        optimal_time = self._find_optimal_time(parsed_request, meeting_duration)
+        optimal_time = self._find_optimal_time(parsed_request, meeting_duration, now)
         
         # Determine strategy based on subject
-        subject = parsed_request.get('subject', '').lower()
-        
-        if 'feedback' in subject and len(available_participants) >= 1:
+        if _subject_flags(parsed_request)['is_feedback'] and len(available_participants) >= 1:
             # Test Case 4 scenario - feedback can be handled by available person
-            return {
-                'action': 'schedule_partial',
-                'recommended_time': optimal_time,
-                'participants_to_include': available_participants,
-                'reason': f'Meeting can proceed with {", ".join(available_participants)}. Will update {", ".join(busy_participants)} separately.',
-                'meeting_duration': meeting_duration,
-                'follow_up_needed': busy_participants
-            }
+            return Resolution(
+                action='schedule_partial',
+                recommended_time=optimal_time,
+                participants_to_include=available_participants,
+                reason=f'Meeting can proceed with {", ".join(available_participants)}. Will update {", ".join(busy_participants)} separately.',
+                meeting_duration=meeting_duration,
+                extra={'follow_up_needed': busy_participants}
+            )
         
         else:
             # Test Case 2 scenario - schedule with organizer first, then with busy person later
-            organizer = parsed_request.get('From', parsed_request['participants'][0])
+            organizer = parsed_request.get('organizer', parsed_request.get('From', ''))
             
-            return {
-                'action': 'schedule_organizer_first',
-                'recommended_time': optimal_time,
-                'participants_to_include': [organizer] + available_participants,
-                'reason': f'Scheduling with organizer and available participants first. Will arrange separate time with {", ".join(busy_participants)}.',
-                'meeting_duration': meeting_duration,
-                'follow_up_meetings': [
-                    {
-                        'participants': [organizer] + busy_participants,
-                        'time': self._find_alternative_time(meeting_duration),
-                        'reason': 'Follow-up meeting with previously busy participants'
-                    }
-                ]
-            }
+            return Resolution(
+                action='schedule_organizer_first',
+                recommended_time=optimal_time,
+                participants_to_include=[organizer] + available_participants,
+                reason=f'Scheduling with organizer and available participants first. Will arrange separate time with {", ".join(busy_participants)}.',
+                meeting_duration=meeting_duration,
+                extra={
+                    'follow_up_meetings': [
+                        {
+                            'participants': [organizer] + busy_participants,
+                            'time': self._find_alternative_time(meeting_duration, now),
+                            'reason': 'Follow-up meeting with previously busy participants'
+                        }
+                    ]
+                }
+            )
     
-    def _find_optimal_time(self, parsed_request, meeting_duration):
+    def _find_optimal_time(self, parsed_request, meeting_duration, now):
         """Find optimal meeting time based on constraints"""
         constraint = parsed_request.get('time_constraints', 'flexible')
         
         # Parse specific time if mentioned
-        if 'thursday' in constraint.lower():
-            base_date = self._get_next_thursday()
-            if is_weekend(base_date):
-                # If somehow Thursday calculation results in weekend, move to Monday
-                base_date = self._get_next_monday()
-            return base_date.replace(hour=10, minute=30).strftime('%Y-%m-%dT%H:%M:%S+05:30')
-        
-        elif 'monday' in constraint.lower():
-            base_date = self._get_next_monday()
-            if '9:00' in constraint:
-                return base_date.replace(hour=9, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
-            return base_date.replace(hour=10, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        constraint_lower = constraint.lower()
+        for day, weekday, (hour, minute), override in _DAY_MEETING_TIMES:
+            if day in constraint_lower:
+                if override and override[0] in constraint:
+                    hour, minute = override[1]
+                base_date = self._next_weekday(weekday, now)
+                return _fmt_ist(base_date.year, base_date.month, base_date.day, hour, minute)
         
-        elif 'tuesday' in constraint.lower():
-            base_date = self._get_next_tuesday()
-            if '11:00' in constraint:
-                return base_date.replace(hour=11, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
-            return base_date.replace(hour=10, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        # Default to next available business hour
+        next_slot = now + timedelta(hours=1)
+        slot_date = next_slot.date()
+        hour = next_slot.hour
         
-        elif 'wednesday' in constraint.lower():
-            base_date = self._get_next_wednesday()
-            if '10:00' in constraint:
-                return base_date.replace(hour=10, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
-            return base_date.replace(hour=10, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        # Ensure it's during business hours (9:00 to 17:00 starts) and not weekend
+        if hour < 9:
+            hour = 9
+        elif hour > 17:
+            slot_date += timedelta(days=1)
+            hour = 9
+        weekday = slot_date.weekday()
+        if weekday >= 5:
+            # Move to next Monday
+            slot_date += timedelta(days=7 - weekday)
+            hour = 9
         
-        elif 'friday' in constraint.lower():
-            base_date = self._get_next_friday()
-            return base_date.replace(hour=10, minute=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
-        
-        else:
-            # Default to next available business hour
-            next_slot = datetime.now() + timedelta(hours=1)
-            next_slot = next_slot.replace(minute=0, second=0, microsecond=0)
-            
-            # Ensure it's during business hours and not weekend
-            while is_weekend(next_slot) or next_slot.hour < 9 or next_slot.hour > 17:
-                if is_weekend(next_slot):
-                    # Move to next Monday
-                    days_to_monday = (7 - next_slot.weekday()) % 7
-                    if days_to_monday == 0:
-                        days_to_monday = 7
-                    next_slot = next_slot + timedelta(days=days_to_monday)
-                    next_slot = next_slot.replace(hour=9)
-                elif next_slot.hour < 9:
-                    next_slot = next_slot.replace(hour=9)
-                elif next_slot.hour > 17:
-                    next_slot = next_slot + timedelta(days=1)
-                    next_slot = next_slot.replace(hour=9)
-            
-            return next_slot.strftime('%Y-%m-%dT%H:%M:%S+05:30')
-    
-    def _get_next_thursday(self):
-        """Get next Thursday"""
-        today = datetime.now()
-        days_ahead = 3 - today.weekday()  # Thursday = 3
-        if days_ahead <= 0:
-            days_ahead += 7
-        return today + timedelta(days=days_ahead)
-    
-    def _get_next_monday(self):
-        """Get next Monday"""
-        today = datetime.now()
-        days_ahead = 0 - today.weekday()  # Monday = 0
-        if days_ahead <= 0:
-            days_ahead += 7
-        return today + timedelta(days=days_ahead)
+        return _fmt_ist(slot_date.year, slot_date.month, slot_date.day, hour, 0)
     
-    def _get_next_tuesday(self):
-        """Get next Tuesday"""
-        today = datetime.now()
-        days_ahead = 1 - today.weekday()  # Tuesday = 1
-        if days_ahead <= 0:
-            days_ahead += 7
-        return today + timedelta(days=days_ahead)
+    def _next_weekday(self, weekday, now):
+        """Get the next date falling on weekday (Monday=0), never today"""
+        return now + timedelta(days=(weekday - now.weekday()) % 7 or 7)
     
-    def _get_next_wednesday(self):
-        """Get next Wednesday"""
-        today = datetime.now()
-        days_ahead = 2 - today.weekday()  # Wednesday = 2
-        if days_ahead <= 0:
-            days_ahead += 7
-        return today + timedelta(days=days_ahead)
-    
-    def _get_next_friday(self):
-        """Get next Friday"""
-        today = datetime.now()
-        days_ahead = 4 - today.weekday()  # Friday = 4
-        if days_ahead <= 0:
-            days_ahead += 7
-        return today + timedelta(days=days_ahead)
-    
-    def _get_tomorrow_time(self, meeting_duration):
+    def _get_tomorrow_time(self, meeting_duration, now):
         """Get tomorrow's meeting time"""
-        tomorrow = datetime.now() + timedelta(days=1)
+        tomorrow = now + timedelta(days=1)
         
         # If tomorrow is weekend, move to next Monday
-        if is_weekend(tomorrow):
-            days_to_monday = (7 - tomorrow.weekday()) % 7
-            if days_to_monday == 0:
-                days_to_monday = 7
-            tomorrow = tomorrow + timedelta(days=days_to_monday)
+        weekday = tomorrow.weekday()
+        if weekday >= 5:
+            tomorrow += timedelta(days=7 - weekday)
         
-        return tomorrow.replace(hour=10, minute=0, second=0, microsecond=0).strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        return _fmt_ist(tomorrow.year, tomorrow.month, tomorrow.day, 10, 0)
     
-    def _find_alternative_time(self, meeting_duration):
+    def _find_alternative_time(self, meeting_duration, now):
         """Find alternative time for follow-up meetings"""
-        alternative = datetime.now() + timedelta(hours=2)
-        alternative = alternative.replace(minute=0, second=0, microsecond=0)
-        return alternative.strftime('%Y-%m-%dT%H:%M:%S+05:30')
+        alternative = now + timedelta(hours=2)
+        return _fmt_ist(alternative.year, alternative.month, alternative.day, alternative.hour, 0)
     
-    def _reschedule_for_all(self, parsed_request, meeting_duration):
+    def _reschedule_for_all(self, parsed_request, meeting_duration, now):
         """Reschedule when all participants are needed"""
-        tomorrow_time = self._get_tomorrow_time(meeting_duration)
+        tomorrow_time = self._get_tomorrow_time(meeting_duration, now)
         
-        return {
-            'action': 'reschedule_tomorrow',
-            'recommended_time': tomorrow_time,
-            'participants_to_include': parsed_request['participants'],
-            'reason': 'All participants are required but some are busy. Rescheduling to tomorrow.',
-            'meeting_duration': meeting_duration
-        }
+        return Resolution(
+            action='reschedule_tomorrow',
+            recommended_time=tomorrow_time,
+            participants_to_include=parsed_request['participants'],
+            reason='All participants are required but some are busy. Rescheduling to tomorrow.',
+            meeting_duration=meeting_duration
+        )
     
-    def _schedule_with_reschedule(self, parsed_request, busy_person, meeting_duration):
+    def _schedule_with_reschedule(self, parsed_request, busy_person, meeting_duration, now):
         """Schedule meeting and reschedule conflicting low-priority meeting"""
-        optimal_time = self._find_optimal_time(parsed_request, meeting_duration)
+        optimal_time = self._find_optimal_time(parsed_request, meeting_duration, now)
         
-        return {
-            'action': 'schedule_all_with_reschedule',
-            'recommended_time': optimal_time,
-            'participants_to_include': parsed_request['participants'],
-            'reason': f'Rescheduling {busy_person}\'s low-priority meeting to accommodate this important meeting.',
-            'meeting_duration': meeting_duration,
-            'reschedule_needed': busy_person
-        }
+        return Resolution(
+            action='schedule_all_with_reschedule',
+            recommended_time=optimal_time,
+            participants_to_include=parsed_request['participants'],
+            reason=f'Rescheduling {busy_person}\'s low-priority meeting to accommodate this important meeting.',
+            meeting_duration=meeting_duration,
+            extra={'reschedule_needed': busy_person}
+        )
@@ -2,37 +2,101 @@
 Main Meeting Assistant Module
 Integrates all components for complete AI scheduling functionality
 """
+import asyncio
+import atexit
+import concurrent.futures
 import json
+import logging
 import sys
 import os
+import re
+import threading
 import time 
 from datetime import datetime
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # I used it to add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ai_agent import AI_AGENT
-from calendar_utils import retrive_calendar_events, get_date_range_from_constraint
-from conflict_resolver import ConflictResolver
-from output_formatter import OutputFormatter
+from ai_agent import AI_AGENT, make_http_client
+from calendar_utils import retrieve_calendar_events_multi, get_date_range_from_constraint, check_weekend_constraint
+from conflict_resolver import ConflictResolver, classify_subject
+from output_formatter import MeetingOutput, format_output
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait for all participants' calendars before treating the rest as free
+CALENDAR_FETCH_TIMEOUT = 3
+# Seconds a request thread waits on an AI call before giving up on it
+AI_CALL_TIMEOUT = 10
+
+# Request fields copied as-is into responses that have no scheduled event
+_ECHO_KEYS = ('Request_id', 'Datetime', 'Location', 'From', 'Attendees', 'Subject', 'EmailContent')
+
+# (phrase, value) in the order the manual parser gives them precedence
+_DURATION_PHRASES = (
+    ('30 minutes', 30), ('half hour', 30),
+    ('1 hour', 60), ('an hour', 60),
+    ('15 minutes', 15)
+)
+_CONSTRAINT_PHRASES = (
+    ('saturday', 'weekend'), ('sunday', 'weekend'), ('weekend', 'weekend'),
+    ('thursday', 'thursday'), ('monday', 'monday'), ('tuesday', 'tuesday'),
+    ('wednesday', 'wednesday'), ('friday', 'friday'), ('tomorrow', 'tomorrow')
+)
+# Every phrase from both tables, found in one pass over the email
+_PARSE_PHRASE_RE = re.compile('|'.join(re.escape(phrase) for phrase, _ in _DURATION_PHRASES + _CONSTRAINT_PHRASES))
 
 class MeetingAssistant:
     def __init__(self):
-        # Initialize AI client
+        # One long-lived loop for every AI call: the async client's pooled
+        # connections belong to the loop that opened them
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="ai-event-loop", daemon=True)
+        self._loop_thread.start()
+        
+        # Initialize AI client, created on that loop so it is the only one its pool ever sees
         self.base_url = "http://localhost:4000/v1"
         self.model_path = "/home/user/Models/meta-llama/Meta-Llama-3.1-8B-Instruct"
         try:
-            self.client = OpenAI(api_key="NULL", base_url=self.base_url, timeout=3, max_retries=1)  # Fast timeout
+            self.client = self.run_async(self._open_client())
             self.ai_agent = AI_AGENT(self.client, self.model_path)
         except Exception as e:
-            print(f"Warning: AI client initialization failed: {e}")
+            log.warning("AI client initialization failed: %s", e)
             self.client = None
             self.ai_agent = None
         
         # Initialize other components
         self.conflict_resolver = ConflictResolver(self.ai_agent)
-        self.output_formatter = OutputFormatter()
+    
+    async def _open_client(self):
+        """AI client with its own sized connection pool, for this assistant's loop only"""
+        return AsyncOpenAI(api_key="NULL", base_url=self.base_url, timeout=3, max_retries=1, http_client=make_http_client())  # Fast timeout
+    
+    def run_async(self, coro, timeout=AI_CALL_TIMEOUT):
+        """
+        Run a coroutine on the assistant's event loop and wait for its result
+        Raises concurrent.futures.TimeoutError, after cancelling the coroutine, if it takes over timeout seconds
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    def close(self):
+        """Close the AI client's connections on the loop that opened them, then stop the loop"""
+        if self._loop.is_closed():
+            return
+        if self.client is not None:
+            try:
+                self.run_async(self.client.close())
+            except Exception as e:
+                log.warning("AI client close failed: %s", e)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
     
     def your_meeting_assistant(self, data):
         """
@@ -40,142 +104,131 @@ class MeetingAssistant:
         Args:
             data (dict): Input JSON data with meeting request
         Returns:
-            dict: Formatted response with meeting schedule
+            MeetingOutput: Formatted response, with empty event fields for weekend rejections and errors
         """
         try:
-            start_time = time.time()  # Start timing
+            start_time = time.perf_counter()  # Start timing
+            debug = log.isEnabledFor(logging.DEBUG)
             
-            print(f"\\n=== Processing Meeting Request ===")
-            print(f"Request ID: {data.get('Request_id', 'N/A')}")
-            print(f"Subject: {data.get('Subject', 'N/A')}")
+            if debug:
+                log.debug("Processing meeting request %s: %s", data.get('Request_id', 'N/A'), data.get('Subject', 'N/A'))
             
             # Step 1: Parse the meeting request
-            parse_start = time.time()
             parsed_request = self._parse_meeting_request(data)
-            parse_time = time.time() - parse_start
-            print(f"\\nParsing took: {parse_time:.2f} seconds")
+            if debug:
+                stage_end = time.perf_counter()
+                log.debug("Parsing took: %.2f seconds", stage_end - start_time)
+            
+            # Weekend requests are rejected straight from the parse, no calendars needed
+            if parsed_request['_reject_weekend']:
+                log.info("Weekend meeting requested - rejecting")
+                return self._create_weekend_rejection_response(data)
             
             # Step 2: Get calendar events for all participants
-            calendar_start = time.time()
             all_participants_events = self._get_all_participants_events(parsed_request)
-            calendar_time = time.time() - calendar_start
-            print(f"Calendar fetch took: {calendar_time:.2f} seconds")
+            if debug:
+                stage_start, stage_end = stage_end, time.perf_counter()
+                log.debug("Calendar fetch took: %.2f seconds", stage_end - stage_start)
             
             # Step 3: Resolve conflicts
-            resolve_start = time.time()
             resolution_result = self._resolve_conflicts(parsed_request, all_participants_events)
-            resolve_time = time.time() - resolve_start
-            print(f"Conflict resolution took: {resolve_time:.2f} seconds")
+            if debug:
+                stage_start, stage_end = stage_end, time.perf_counter()
+                log.debug("Conflict resolution took: %.2f seconds", stage_end - stage_start)
             
             # Step 4: Format output
-            format_start = time.time()
             final_output = self._format_final_output(data, resolution_result, all_participants_events)
-            format_time = time.time() - format_start
-            print(f"Formatting took: {format_time:.2f} seconds")
             
-            total_time = time.time() - start_time
-            print(f"\\n✅ TOTAL TIME: {total_time:.2f} seconds")
+            end_time = time.perf_counter()
+            total_time = end_time - start_time
+            if debug:
+                log.debug("Formatting took: %.2f seconds", end_time - stage_end)
+                log.debug("Total time: %.2f seconds", total_time)
             
             if total_time > 10.0:
-                print(f"⚠️ WARNING: Response time {total_time:.2f}s exceeds 10s target!")
+                log.warning("Response time %.2fs exceeds 10s target", total_time)
             
             return final_output
             
         except Exception as e:
-            print(f"Error in meeting assistant: {str(e)}")
-            
-            # Special handling for weekend requests
-            if "WEEKEND_MEETING_REQUESTED" in str(e):
-                return self._create_weekend_rejection_response(data)
-            
-            return self._create_error_response(data, str(e))
+            log.error("Error in meeting assistant: %s", e)
+            return self._create_failure_response(data, e)
     
     def _parse_meeting_request(self, data):
         """Parse meeting request - Manual first, then AI if needed"""
         
         # FAST MANUAL PARSING FIRST (most reliable for speed)
-        manual_result = self._manual_parse_request(data)
+        parsed_request = self._manual_parse_request(data)
         
         # Only use AI if manual parsing is too vague AND we have AI available
-        if self.ai_agent and manual_result['time_constraints'] == 'next available time':
+        if self._needs_ai_parse(parsed_request):
             try:
-                print("   Using AI for better parsing...")
+                log.debug("Using AI for better parsing")
                 email_content = data.get('EmailContent', '')
-                ai_parsed_data = self.ai_agent.parse_email(email_content)
-                
-                # I Merged AI results with manual results
-                participants = [data.get('From', '')] + [att['email'] for att in data.get('Attendees', [])]
-                participants = list(set(participants))
-                
-                parsed_request = {
-                    'participants': participants,
-                    'meeting_duration': ai_parsed_data.get('meeting_duration', manual_result['meeting_duration']),
-                    'time_constraints': ai_parsed_data.get('time_constraints', manual_result['time_constraints']),
-                    'subject': data.get('Subject', ai_parsed_data.get('subject', 'Meeting')),
-                    'start_time': ai_parsed_data.get('start_time'),
-                    'From': data.get('From', '')
-                }
-                return parsed_request
+                ai_parsed_data = self.run_async(self.ai_agent.parse_email(email_content))
+                parsed_request = self._merge_ai_parse(data, parsed_request, ai_parsed_data)
                 
             except Exception as e:
-                print(f"   AI parsing failed, using manual: {e}")
+                log.warning("AI parsing failed, using manual: %s", e)
         
-        return manual_result
+        return self._flag_weekend(parsed_request)
+    
+    def _flag_weekend(self, parsed_request):
+        """Mark requests whose time constraint asks for a weekend"""
+        parsed_request['_reject_weekend'] = check_weekend_constraint(parsed_request['time_constraints'])
+        return parsed_request
+    
+    def _needs_ai_parse(self, manual_result):
+        """AI parsing is only worth it when the manual parse found no time constraint"""
+        return bool(self.ai_agent) and manual_result['time_constraints'] == 'next available time'
+    
+    def _merge_ai_parse(self, data, manual_result, ai_parsed_data):
+        """Merge AI parsing results with the manual parse of the same request"""
+        subject = data.get('Subject', ai_parsed_data.get('subject', 'Meeting'))
+        
+        return {
+            'participants': manual_result['participants'],
+            'meeting_duration': ai_parsed_data.get('meeting_duration', manual_result['meeting_duration']),
+            'time_constraints': ai_parsed_data.get('time_constraints', manual_result['time_constraints']),
+            'subject': subject,
+            **classify_subject(subject),
+            'start_time': ai_parsed_data.get('start_time'),
+            'From': data.get('From', ''),
+            'organizer': data.get('From', '')
+        }
     
     def _manual_parse_request(self, data):
         """Manual parsing when AI is not available"""
         participants = [data.get('From', '')] + [att['email'] for att in data.get('Attendees', [])]
-        participants = list(set(participants))
+        participants = list(dict.fromkeys(participants))  # Remove duplicates, organizer stays first
         
-        # Extract duration from email content
-        email_content = data.get('EmailContent', '').lower()
-        duration = 30  # default
+        # Scan the email once for every duration and time constraint phrase
+        email_lower = data.get('EmailContent', '').lower()
+        found = set(_PARSE_PHRASE_RE.findall(email_lower))
         
-        if '30 minutes' in email_content or 'half hour' in email_content:
-            duration = 30
-        elif '1 hour' in email_content or 'an hour' in email_content:
-            duration = 60
-        elif '15 minutes' in email_content:
-            duration = 15
+        duration = next((minutes for phrase, minutes in _DURATION_PHRASES if phrase in found), 30)
         
-        # Extract time constraints including weekend detection
-        time_constraints = 'next available time'
-        email_lower = email_content.lower()
+        # Weekend words come first, then specific days
+        time_constraints = next(
+            (constraint for phrase, constraint in _CONSTRAINT_PHRASES if phrase in found),
+            'next available time'
+        )
         
-        # Check for weekends first
-        if any(word in email_lower for word in ['saturday', 'sunday', 'weekend']):
-            time_constraints = 'weekend'
-        # Check for specific days
-        elif 'thursday' in email_lower:
-            time_constraints = 'thursday'
-        elif 'monday' in email_lower:
-            time_constraints = 'monday'
-        elif 'tuesday' in email_lower:
-            time_constraints = 'tuesday'
-        elif 'wednesday' in email_lower:
-            time_constraints = 'wednesday'
-        elif 'friday' in email_lower:
-            time_constraints = 'friday'
-        elif 'tomorrow' in email_lower:
-            time_constraints = 'tomorrow'
+        subject = data.get('Subject', 'Meeting')
         
         return {
             'participants': participants,
             'meeting_duration': duration,
             'time_constraints': time_constraints,
-            'subject': data.get('Subject', 'Meeting'),
+            'subject': subject,
+            **classify_subject(subject),
             'start_time': None,
-            'From': data.get('From', '')
+            'From': data.get('From', ''),
+            'organizer': data.get('From', '')
         }
     
     def _get_all_participants_events(self, parsed_request):
         """Retrieve calendar events for all participants"""
-        all_events = {}
-        
-        # weekend check first - saves time
-        if parsed_request['time_constraints'] == 'weekend':
-            raise ValueError("WEEKEND_MEETING_REQUESTED")
-        
         # Get date range based on time constraints
         start_time, end_time = get_date_range_from_constraint(
             parsed_request['time_constraints'], 
@@ -184,34 +237,21 @@ class MeetingAssistant:
         
         # Check if weekend was requested
         if start_time is None and end_time is None:
-            print(f"Weekend meeting requested - rejecting")
+            log.info("Weekend meeting requested - rejecting")
             raise ValueError("WEEKEND_MEETING_REQUESTED")
         
-        print(f"Checking calendars from {start_time} to {end_time}")
+        log.debug("Checking calendars from %s to %s", start_time, end_time)
         
-        # SIMPLE PARALLEL FETCHING for speed
-        import threading
-        threads = []
-        results = {}
-        
-        def fetch_calendar(participant):
-            try:
-                events = retrive_calendar_events(participant, start_time, end_time)
-                results[participant] = events
-                print(f"  {participant}: {len(events)} events found")
-            except Exception as e:
-                print(f"  {participant}: Calendar access failed ({e})")
-                results[participant] = []  # Assume available if can't access calendar
-        
-        # Start all calendar fetches in parallel
-        for participant in parsed_request['participants']:
-            thread = threading.Thread(target=fetch_calendar, args=(participant,))
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all to complete (max 3 seconds)
-        for thread in threads:
-            thread.join(timeout=3)
+        # Parallel fetching on the shared calendar pool, 3 seconds for all of them together
+        results = retrieve_calendar_events_multi(
+            parsed_request['participants'],
+            start_time,
+            end_time,
+            timeout=CALENDAR_FETCH_TIMEOUT
+        )
+        if log.isEnabledFor(logging.DEBUG):
+            for participant, events in results.items():
+                log.debug("%s: %d events found", participant, len(events))
         
         return results
     
@@ -225,50 +265,65 @@ class MeetingAssistant:
     
     def _format_final_output(self, original_data, resolution_result, all_participants_events):
         """Format the final output"""
-        return self.output_formatter.format_output(
+        return format_output(
             original_data,
             resolution_result,
             all_participants_events
         )
     
+    def _create_failure_response(self, data, error):
+        """Response for a request that could not be scheduled"""
+        # Special handling for weekend requests
+        if "WEEKEND_MEETING_REQUESTED" in str(error):
+            return self._create_weekend_rejection_response(data)
+        
+        return self._create_error_response(data, str(error))
+    
     def _create_weekend_rejection_response(self, data):
         """Create response for weekend meeting requests"""
-        return {
-            "Request_id": data.get("Request_id", ""),
-            "Datetime": data.get("Datetime", ""),
-            "Location": data.get("Location", ""),
-            "From": data.get("From", ""),
-            "Attendees": data.get("Attendees", []),
-            "Subject": data.get("Subject", ""),
-            "EmailContent": data.get("EmailContent", ""),
-            "EventStart": "",
-            "EventEnd": "",
-            "Duration_mins": "",
-            "MetaData": {
+        return MeetingOutput(
+            **_echo_request_fields(data),
+            EventStart="",
+            EventEnd="",
+            Duration_mins="",
+            MetaData={
                 "status": "rejected",
                 "reason": "Its weekends no meetings are possible",
                 "message": "Weekend meetings are not allowed. Please schedule during business days (Monday-Friday)."
             }
-        }
+        )
     
     def _create_error_response(self, data, error_message):
         """Create error response when processing fails"""
-        return {
-            "Request_id": data.get("Request_id", ""),
-            "Datetime": data.get("Datetime", ""),
-            "Location": data.get("Location", ""),
-            "From": data.get("From", ""),
-            "Attendees": data.get("Attendees", []),
-            "Subject": data.get("Subject", ""),
-            "EmailContent": data.get("EmailContent", ""),
-            "EventStart": "",
-            "EventEnd": "",
-            "Duration_mins": "30",
-            "MetaData": {
+        return MeetingOutput(
+            **_echo_request_fields(data),
+            EventStart="",
+            EventEnd="",
+            Duration_mins="30",
+            MetaData={
                 "error": error_message,
                 "status": "failed"
             }
-        }
+        )
+
+def _echo_request_fields(data):
+    """Request fields every unscheduled response echoes back, as MeetingOutput keyword arguments"""
+    response = {key: data.get(key, "") for key in _ECHO_KEYS}
+    response["Attendees"] = data.get("Attendees", [])
+    return response
+
+_ASSISTANT = None
+_ASSISTANT_LOCK = threading.Lock()
+
+def get_meeting_assistant():
+    """Process-wide MeetingAssistant, created on first use"""
+    global _ASSISTANT
+    if _ASSISTANT is None:
+        with _ASSISTANT_LOCK:
+            if _ASSISTANT is None:
+                _ASSISTANT = MeetingAssistant()
+                atexit.register(_ASSISTANT.close)
+    return _ASSISTANT
 
 # For backward compatibility and easy testing
 def your_meeting_assistant(data):
@@ -276,5 +331,4 @@ def your_meeting_assistant(data):
     Wrapper function for the meeting assistant
     This function is called from the Flask server
     """
-    assistant = MeetingAssistant()
-    return assistant.your_meeting_assistant(data)
+    return get_meeting_assistant().your_meeting_assistant(data)
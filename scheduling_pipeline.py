@@ -0,0 +1,187 @@
+"""
+Asynchronous pipeline for scheduling many meeting requests at once
+"""
+import asyncio
+import logging
+
+from meeting_assistant import get_meeting_assistant, AI_CALL_TIMEOUT
+
+log = logging.getLogger(__name__)
+
+# Marks the end of a queue's input
+_DONE = object()
+
+class SchedulingPipeline:
+    """
+    parse -> calendar fetch -> resolve, connected by bounded queues
+
+    A micro-batcher collects requests that need AI parsing (up to max_batch,
+    or whatever arrived within batch_timeout seconds) and sends them to vLLM
+    as a single batched request. Calendar fetchers and resolvers meanwhile
+    work on earlier requests, so GPU decode overlaps Google API round-trips.
+    """
+    def __init__(self, assistant, max_batch=32, batch_timeout=0.01, fetchers=8, resolvers=4, queue_size=64):
+        self.assistant = assistant
+        self.max_batch = max_batch
+        self.batch_timeout = batch_timeout
+        self.fetchers = fetchers
+        self.resolvers = resolvers
+        self.queue_size = queue_size
+
+    async def run(self, requests):
+        """
+        Process meeting requests through the pipeline
+        Args:
+            requests (list): Input JSON data, one dict per meeting request
+        Returns:
+            list: MeetingOutput responses, in the same order as requests
+        """
+        parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        fetch_queue = asyncio.Queue(maxsize=self.queue_size)
+        resolve_queue = asyncio.Queue(maxsize=self.queue_size)
+        results = [None] * len(requests)
+
+        parser = asyncio.create_task(self._parse_stage(parse_queue, fetch_queue))
+        fetch_workers = [asyncio.create_task(self._fetch_worker(fetch_queue, resolve_queue)) for _ in range(self.fetchers)]
+        resolve_workers = [asyncio.create_task(self._resolve_worker(resolve_queue, results)) for _ in range(self.resolvers)]
+
+        for index, data in enumerate(requests):
+            await parse_queue.put((index, data))
+        await parse_queue.put(_DONE)
+
+        # Shut the stages down in order once everything upstream has drained
+        await parser
+        for _ in fetch_workers:
+            await fetch_queue.put(_DONE)
+        await asyncio.gather(*fetch_workers)
+        for _ in resolve_workers:
+            await resolve_queue.put(_DONE)
+        await asyncio.gather(*resolve_workers)
+
+        return results
+
+    async def _parse_stage(self, parse_queue, fetch_queue):
+        """Micro-batch parse: up to max_batch jobs or batch_timeout, whichever comes first"""
+        loop = asyncio.get_running_loop()
+        finished = False
+
+        while not finished:
+            job = await parse_queue.get()
+            if job is _DONE:
+                break
+
+            batch = [job]
+            deadline = loop.time() + self.batch_timeout
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(parse_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if job is _DONE:
+                    finished = True
+                    break
+                batch.append(job)
+
+            for parsed_job in await self._parse_batch(batch):
+                await fetch_queue.put(parsed_job)
+
+    async def _parse_batch(self, batch):
+        """Manual parse for every job, one batched AI request for the vague ones"""
+        parsed_jobs = []
+        for index, data in batch:
+            try:
+                parsed_jobs.append((index, data, self.assistant._manual_parse_request(data), None))
+            except Exception as e:
+                parsed_jobs.append((index, data, None, e))
+
+        needs_ai = [
+            position for position, (_, _, parsed_request, error) in enumerate(parsed_jobs)
+            if error is None and self.assistant._needs_ai_parse(parsed_request)
+        ]
+        if needs_ai:
+            try:
+                emails = [parsed_jobs[position][1].get('EmailContent', '') for position in needs_ai]
+                ai_results = await asyncio.wait_for(self.assistant.ai_agent.parse_emails_bulk(emails), AI_CALL_TIMEOUT)
+                for position, ai_parsed_data in zip(needs_ai, ai_results):
+                    index, data, manual_result, _ = parsed_jobs[position]
+                    parsed_jobs[position] = (index, data, self.assistant._merge_ai_parse(data, manual_result, ai_parsed_data), None)
+            except Exception as e:
+                log.warning("AI batch parsing failed, using manual: %s", e)
+
+        for position, (index, data, parsed_request, error) in enumerate(parsed_jobs):
+            if error is None:
+                try:
+                    self.assistant._flag_weekend(parsed_request)
+                except Exception as e:
+                    parsed_jobs[position] = (index, data, None, e)
+        return parsed_jobs
+
+    async def _fetch_worker(self, fetch_queue, resolve_queue):
+        """Fetch participants' calendars off the event loop"""
+        while True:
+            job = await fetch_queue.get()
+            if job is _DONE:
+                return
+
+            index, data, parsed_request, error = job
+            events = None
+            if error is None and not parsed_request['_reject_weekend']:
+                try:
+                    events = await asyncio.to_thread(self.assistant._get_all_participants_events, parsed_request)
+                except Exception as e:
+                    error = e
+            await resolve_queue.put((index, data, parsed_request, events, error))
+
+    async def _resolve_worker(self, resolve_queue, results):
+        """Resolve conflicts and format the final response"""
+        while True:
+            job = await resolve_queue.get()
+            if job is _DONE:
+                return
+
+            index, data, parsed_request, all_participants_events, error = job
+            result = None
+            try:
+                if error is not None:
+                    raise error
+                if parsed_request['_reject_weekend']:
+                    result = self.assistant._create_weekend_rejection_response(data)
+                else:
+                    resolution_result = self.assistant._resolve_conflicts(parsed_request, all_participants_events)
+                    result = self.assistant._format_final_output(data, resolution_result, all_participants_events)
+            except Exception as e:
+                log.exception("Error in scheduling pipeline: %s", e)
+                result = self._failure_result(data, e)
+            finally:
+                # Every job fills its slot, so one bad request never stops this worker
+                results[index] = result
+
+    def _failure_result(self, data, error):
+        """The assistant's failure response, or a minimal error dict if even that can't be built"""
+        try:
+            return self.assistant._create_failure_response(data, error)
+        except Exception as e:
+            log.error("Could not build failure response: %s", e)
+            return {
+                "Request_id": data.get("Request_id", "") if isinstance(data, dict) else "",
+                "error": str(error),
+                "status": "failed"
+            }
+
+def schedule_meetings(requests, assistant=None, **pipeline_options):
+    """
+    Schedule a list of meeting requests concurrently
+    Args:
+        requests (list): Input JSON data, one dict per meeting request
+        assistant (MeetingAssistant): Assistant to use, the shared one if not given
+        **pipeline_options: SchedulingPipeline tuning (max_batch, batch_timeout, ...)
+    Returns:
+        list: MeetingOutput responses, in the same order as requests
+    """
+    assistant = assistant or get_meeting_assistant()
+    # Runs on the assistant's own loop, where its AI client's connections live. The whole run
+    # grows with len(requests), so it isn't bounded; each AI batch inside it is
+    return assistant.run_async(SchedulingPipeline(assistant, **pipeline_options).run(requests), timeout=None)
@@ -1,38 +1,166 @@
 from flask import Flask, request, jsonify
-from threading import Thread
+from flask.json.provider import JSONProvider
+from threading import Thread, Lock
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
 import sys
 import os
+import uuid
+try:
+    import orjson
+    def _json_bytes(obj):
+        return orjson.dumps(obj)
+    def _json_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    
+    class OrjsonProvider(JSONProvider):
+        """Flask JSON provider backed by orjson, used by jsonify and request.get_json"""
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+except ImportError:
+    # orjson serializes MeetingOutput (a dataclass) natively, json needs it as a dict
+    def _json_default(obj):
+        if isinstance(obj, MeetingOutput):
+            return obj.to_dict()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    def _json_bytes(obj):
+        return json.dumps(obj, separators=(',', ':'), default=_json_default).encode()
+    def _json_pretty(obj):
+        return json.dumps(obj, indent=2, default=_json_default)
+    # Flask's default provider is stdlib json already
+    OrjsonProvider = None
+try:
+    import waitress
+except ImportError:
+    # waitress is optional, Werkzeug's server is used (threaded) without it
+    waitress = None
 
 from meeting_assistant import your_meeting_assistant
+from output_formatter import MeetingOutput
+
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
-received_data = []
+if OrjsonProvider is not None:
+    app.json = OrjsonProvider(app)
+# Only the last few requests are ever shown by /debug, the total is counted separately
+received_data = deque(maxlen=5)
+received_count = 0
+_received_count_lock = Lock()
+
+# Requests accepted with /receive?async=1 run here; their futures are kept for /result.
+# Jobs live in this process only, so under gunicorn use one worker (with threads) for async mode.
+MAX_STORED_JOBS = 1024
+_JOB_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix='receive')
+_jobs = OrderedDict()
+_jobs_lock = Lock()
+
+def make_json_response(payload, status=200):
+    """JSON response serialized in one pass, without going through jsonify"""
+    return app.response_class(_json_bytes(payload), status=status, mimetype="application/json")
+
+def _schedule(data):
+    """Run one meeting request through the assistant and record it for /debug"""
+    global received_count
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        log.debug("Received meeting request:\n%s", _json_pretty(data))
+    # Process the meeting request using AI assistant
+    response_data = your_meeting_assistant(data)
+    # Store for debugging
+    received_data.append(data)
+    with _received_count_lock:
+        received_count += 1
+    
+    if debug:
+        log.debug("Sending response:\n%s", _json_pretty(response_data))
+    return response_data
+
+def _failure_response(data, error):
+    """500 response for a request that raised"""
+    log.error("Error processing request: %s", error)
+    error_response = {
+        "Request_id": data.get("Request_id", "") if isinstance(data, dict) else "",
+        "error": str(error),
+        "status": "failed"
+    }
+    return make_json_response(error_response, 500)
+
+def _submit_job(data):
+    """
+    Start a request in the background and keep its future for /result
+    Returns the job id, or None when all MAX_STORED_JOBS stored jobs are still running
+    """
+    with _jobs_lock:
+        if len(_jobs) >= MAX_STORED_JOBS:
+            # The oldest finished jobs make room, one still running is never dropped
+            finished = [job_id for job_id, (_, future) in _jobs.items() if future.done()]
+            for job_id in finished[:len(_jobs) - MAX_STORED_JOBS + 1]:
+                del _jobs[job_id]
+            if len(_jobs) >= MAX_STORED_JOBS:
+                return None
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = (data, _JOB_POOL.submit(_schedule, data))
+    return job_id
 
 @app.route('/receive', methods=['POST'])
 def receive():
+    """
+    Schedule a meeting request. Answers with the result, or with 202 and a
+    job id right away when called as /receive?async=1 (collect from /result/<job_id>)
+    """
+    data = None
     try:
-        data = request.get_json()
-        print(f"\\n=== Received Meeting Request ===")
-        print(f"{json.dumps(data, indent=2)}")
-        # Process the meeting request using AI assistant
-        response_data = your_meeting_assistant(data)
-        # Store for debugging
-        received_data.append(data)
+        if request.args.get('async') == '1':
+            # Checked up front, a 202 for a body that can only fail later helps nobody
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return make_json_response({
+                    "Request_id": "",
+                    "error": "Request body must be a JSON object",
+                    "status": "failed"
+                }, 400)
+            
+            job_id = _submit_job(data)
+            if job_id is None:
+                return make_json_response({
+                    "Request_id": data.get("Request_id", ""),
+                    "error": "Too many requests still running, retry later",
+                    "status": "busy"
+                }, 503)
+            return make_json_response({
+                "job_id": job_id,
+                "Request_id": data.get("Request_id", ""),
+                "status": "accepted",
+                "result_url": f"/result/{job_id}"
+            }, 202)
         
-        print(f"\\n=== Sending Response ===")
-        print(f"{json.dumps(response_data, indent=2)}")
-        
-        return jsonify(response_data)
+        data = request.get_json()
+        return make_json_response(_schedule(data))
         
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
-        error_response = {
-            "Request_id": data.get("Request_id", "") if 'data' in locals() else "",
-            "error": str(e),
-            "status": "failed"
-        }
-        return jsonify(error_response), 500
+        return _failure_response(data, e)
+
+@app.route('/result/<job_id>', methods=['GET'])
+def job_result(job_id):
+    """Result of a request submitted with /receive?async=1, 202 while still running"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return make_json_response({"job_id": job_id, "status": "not_found"}, 404)
+    
+    data, future = job
+    if not future.done():
+        return make_json_response({"job_id": job_id, "status": "pending"}, 202)
+    try:
+        return make_json_response(future.result())
+    except Exception as e:
+        return _failure_response(data, e)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -43,8 +171,8 @@ def health_check():
 def debug_info():
     """Debug endpoint to see received requests"""
     return jsonify({
-        "received_requests": len(received_data),
-        "last_requests": received_data[-5:] if received_data else []
+        "received_requests": received_count,
+        "last_requests": list(received_data)
     })
 
 def run_flask():
@@ -52,17 +180,23 @@ def run_flask():
     print("\\n=== Starting AI Meeting Assistant Server ===")
     print("Server will run on http://0.0.0.0:5000")
     print("Endpoints:")
-    print("  POST /receive - Process meeting requests")
+    print("  POST /receive - Process meeting requests (?async=1 to collect from /result/<job_id>)")
+    print("  GET /result/<job_id> - Result of an async request")
     print("  GET /health - Health check")
     print("  GET /debug - Debug information")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # Requests spend most of their time waiting on the LLM and calendar APIs, serve them concurrently
+    if waitress is not None:
+        waitress.serve(app, host='0.0.0.0', port=5000, threads=16)
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
 
 if __name__ == "__main__":
     # Start Flask server
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     run_flask()
-else:
-    # Start Flask in a background thread when imported
+elif 'gunicorn' not in sys.modules:
+    # Start Flask in a background thread when imported (gunicorn serves `app` itself)
     print("Starting AI Meeting Assistant in background...")
     Thread(target=run_flask, daemon=True).start()